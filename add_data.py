@@ -1,5 +1,6 @@
 import oracledb
-import json
+import ijson
+import itertools
 import re
 import os
 import logging
@@ -40,6 +41,9 @@ try:
     else:
         connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn)
     
+    connection.autocommit = False
+    # Keep parsed INSERT statements cached so each (table, columns) shape is parsed only once
+    connection.stmtcachesize = 100
     cursor = connection.cursor()
     logging.info("Database connection established successfully.")
     
@@ -47,44 +51,123 @@ except oracledb.DatabaseError as e:
     logging.error(f"Database connection failed: {str(e)}")
     raise SystemExit(1)
 
-# Load data from JSON file
+DATA_FILE = "new_data.json"
+
+# Scan the JSON file for its top-level table names without building the rows in memory
 try:
-    with open("new_data.json", "r") as file:
-        data = json.load(file)
-    logging.info("JSON data loaded successfully.")
-    logging.info(f"Tables found in JSON: {list(data.keys())}")
+    with open(DATA_FILE, "rb") as file:
+        table_names = [value for prefix, event, value in ijson.parse(file) if prefix == "" and event == "map_key"]
+    logging.info("JSON data scanned successfully.")
+    logging.info(f"Tables found in JSON: {table_names}")
 except FileNotFoundError:
-    logging.error("Error: JSON file 'new_data.json' not found.")
+    logging.error(f"Error: JSON file '{DATA_FILE}' not found.")
     raise
-except json.JSONDecodeError as e:
+except ijson.JSONError as e:
     logging.error(f"Error decoding JSON file: {e}")
     raise
 
-# Function to handle NULL values, escape strings, and format dates for Oracle
-def format_value(value):
-    if value is None or value == "":
-        return "NULL"
-    elif isinstance(value, str):
+# Function to stream the rows of one table from the JSON file
+def stream_rows(table_name):
+    with open(DATA_FILE, "rb") as file:
+        yield from ijson.items(file, f"{table_name}.item", use_float=True)
+
+# Number of rows sent to Oracle per executemany call
+BATCH_SIZE = 1000
+
+# Cheap prefix test for ISO 8601 timestamps; the full parse is left to datetime.fromisoformat
+ISO_TIMESTAMP_PREFIX = re.compile(r"\d{4}-\d{2}-\d{2}T")
+
+# Function to convert a JSON value into a Python type the driver can bind directly
+def bind_value(value):
+    if isinstance(value, str):
         # Check if the value is a datetime in ISO 8601 format
-        if re.match(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})?", value):
-            # Convert to Oracle TO_TIMESTAMP format
-            value = value.split("+")[0].split("Z")[0]  # Remove timezone info
-            # Handle different timestamp formats
-            if "." in value:
-                return f"TO_TIMESTAMP('{value}', 'YYYY-MM-DD\"T\"HH24:MI:SS.FF')"
-            else:
-                return f"TO_TIMESTAMP('{value}', 'YYYY-MM-DD\"T\"HH24:MI:SS')"
-        else:
-            # Escape single quotes for Oracle
-            escaped_value = value.replace("'", "''")
-            return f"'{escaped_value}'"
+        if ISO_TIMESTAMP_PREFIX.match(value):
+            try:
+                timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except ValueError:
+                return value
+            return timestamp.replace(tzinfo=None)  # Remove timezone info
+        return value
     elif isinstance(value, bool):
-        return "1" if value else "0"  # Convert boolean to number for Oracle
+        return 1 if value else 0  # Convert boolean to number for Oracle
     elif isinstance(value, (int, float)):
-        return str(value)
+        return value
     else:
         logging.warning(f"Unsupported data type {type(value)} for value: {value}")
-        return f"'{str(value)}'"
+        return str(value)
+
+# Function to group rows by their non-empty columns and bind value types so each group shares one INSERT statement
+def bucket_rows(table_name, rows):
+    """Yield (columns, row numbers, bind rows) groups of at most BATCH_SIZE rows sharing the same columns and types"""
+    buckets = {}
+    for i, row in enumerate(rows):
+        # Filter out empty values and None values from row
+        filtered_row = {k: v for k, v in row.items() if v is not None and v != ""}
+
+        if not filtered_row:
+            logging.warning(f"Skipping empty row {i+1} in table {table_name}")
+            continue
+
+        # Use a canonical column order so rows with the same columns in a different JSON key order share a bucket
+        columns = tuple(sorted(filtered_row))
+        values = [bind_value(filtered_row[column]) for column in columns]
+        # Include each column's bind type in the key so a whole bucket can share one set of input sizes,
+        # e.g. a timestamp-looking string that fromisoformat rejects stays out of the TIMESTAMP bucket
+        key = frozenset((column, type(value)) for column, value in zip(columns, values))
+        _, row_numbers, bind_rows = buckets.setdefault(key, (columns, [], []))
+        row_numbers.append(i + 1)
+        bind_rows.append(values)
+
+        # Hand full buckets over for insertion so memory stays bounded by the batch size
+        if len(bind_rows) >= BATCH_SIZE:
+            yield buckets.pop(key)
+    yield from buckets.values()
+
+# Function to insert rows sharing the same columns with a single parameterized statement
+def insert_bucket(table_name, columns, row_numbers, bind_rows):
+    """Insert bind_rows via executemany in BATCH_SIZE chunks; returns (successful, failed) row counts"""
+    placeholders = ", ".join(f":{i + 1}" for i in range(len(columns)))
+    insert_query = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+
+    success = 0
+    failure = 0
+    for start in range(0, len(bind_rows), BATCH_SIZE):
+        chunk = bind_rows[start:start + BATCH_SIZE]
+        # Bind datetimes as TIMESTAMP rather than DATE so fractional seconds are kept
+        cursor.setinputsizes(*(oracledb.DB_TYPE_TIMESTAMP if isinstance(value, datetime) else None for value in chunk[0]))
+        try:
+            cursor.executemany(insert_query, chunk, batcherrors=True)
+        except oracledb.DatabaseError as e:
+            failure += len(chunk)
+            logging.error(f"Database error inserting rows {row_numbers[start]}-{row_numbers[start + len(chunk) - 1]} into table {table_name}: {str(e)}")
+            logging.debug(f"Failed query: {insert_query}")
+            continue
+        except Exception as e:
+            failure += len(chunk)
+            logging.error(f"Unexpected error inserting rows {row_numbers[start]}-{row_numbers[start + len(chunk) - 1]} into table {table_name}: {str(e)}")
+            continue
+
+        batch_errors = cursor.getbatcherrors()
+        for error in batch_errors:
+            logging.error(f"Database error inserting row {row_numbers[start + error.offset]} into table {table_name}: {error.message}")
+        failure += len(batch_errors)
+        success += len(chunk) - len(batch_errors)
+    return success, failure
+
+# Function to insert all rows of one table
+def insert_table(table_name, rows):
+    """Insert rows into table_name in column-grouped batches; returns (successful, failed) row counts"""
+    logging.info(f"Processing table: {table_name}")
+
+    table_success = 0
+    table_failures = 0
+    for columns, row_numbers, bind_rows in bucket_rows(table_name, rows):
+        success, failure = insert_bucket(table_name, columns, row_numbers, bind_rows)
+        table_success += success
+        table_failures += failure
+
+    logging.info(f"Table {table_name} completed: {table_success} successful, {table_failures} failed")
+    return table_success, table_failures
 
 # Function to get table insertion order based on foreign key dependencies
 def get_table_order():
@@ -103,93 +186,24 @@ def get_table_order():
         "wheels_temperature"
     ]
 
-# Get the correct insertion order
+# Get the correct insertion order, followed by any tables not in the predefined order
 table_order = get_table_order()
-total_records = 0
+remaining_tables = sorted(set(table_names) - set(table_order))
+if remaining_tables:
+    logging.info(f"Remaining tables to process after the predefined order: {remaining_tables}")
+
 successful_inserts = 0
 failed_inserts = 0
 
-# Process tables in the correct order
-for table_name in table_order:
-    if table_name not in data:
+# Process all tables in a single pass
+for table_name in itertools.chain(table_order, remaining_tables):
+    if table_name not in table_names:
         logging.info(f"No data found for table: {table_name}, skipping...")
         continue
-    
-    rows = data[table_name]
-    logging.info(f"Processing table: {table_name} ({len(rows)} records)")
-    
-    table_success = 0
-    table_failures = 0
-    
-    for i, row in enumerate(rows):
-        try:
-            # Filter out empty values and None values from row
-            filtered_row = {k: v for k, v in row.items() if v is not None and v != ""}
-            
-            if not filtered_row:
-                logging.warning(f"Skipping empty row {i+1} in table {table_name}")
-                continue
-            
-            columns = ", ".join(filtered_row.keys())
-            values = ", ".join(format_value(value) for value in filtered_row.values())
-            insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
-            
-            cursor.execute(insert_query)
-            table_success += 1
-            total_records += 1
-            
-        except oracledb.DatabaseError as e:
-            table_failures += 1
-            failed_inserts += 1
-            logging.error(f"Database error inserting row {i+1} into table {table_name}: {str(e)}")
-            logging.debug(f"Failed query: {insert_query}")
-        except Exception as e:
-            table_failures += 1
-            failed_inserts += 1
-            logging.error(f"Unexpected error inserting row {i+1} into table {table_name}: {str(e)}")
-    
-    successful_inserts += table_success
-    logging.info(f"Table {table_name} completed: {table_success} successful, {table_failures} failed")
 
-# Process any remaining tables not in the predefined order
-remaining_tables = set(data.keys()) - set(table_order)
-if remaining_tables:
-    logging.info(f"Processing remaining tables: {list(remaining_tables)}")
-    for table_name in remaining_tables:
-        rows = data[table_name]
-        logging.info(f"Processing table: {table_name} ({len(rows)} records)")
-        
-        table_success = 0
-        table_failures = 0
-        
-        for i, row in enumerate(rows):
-            try:
-                # Filter out empty values and None values from row
-                filtered_row = {k: v for k, v in row.items() if v is not None and v != ""}
-                
-                if not filtered_row:
-                    logging.warning(f"Skipping empty row {i+1} in table {table_name}")
-                    continue
-                
-                columns = ", ".join(filtered_row.keys())
-                values = ", ".join(format_value(value) for value in filtered_row.values())
-                insert_query = f"INSERT INTO {table_name} ({columns}) VALUES ({values})"
-                
-                cursor.execute(insert_query)
-                table_success += 1
-                total_records += 1
-                
-            except oracledb.DatabaseError as e:
-                table_failures += 1
-                failed_inserts += 1
-                logging.error(f"Database error inserting row {i+1} into table {table_name}: {str(e)}")
-            except Exception as e:
-                table_failures += 1
-                failed_inserts += 1
-                logging.error(f"Unexpected error inserting row {i+1} into table {table_name}: {str(e)}")
-        
-        successful_inserts += table_success
-        logging.info(f"Table {table_name} completed: {table_success} successful, {table_failures} failed")
+    table_success, table_failures = insert_table(table_name, stream_rows(table_name))
+    successful_inserts += table_success
+    failed_inserts += table_failures
 
 # Commit the transaction
 try:
@@ -203,13 +217,21 @@ except oracledb.DatabaseError as e:
 
 # Verify data insertion by counting records in each table
 logging.info("Verifying data insertion...")
-for table_name in data.keys():
-    try:
-        cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-        count = cursor.fetchone()[0]
+count_query = " UNION ALL ".join(f"SELECT '{table_name}', COUNT(*) FROM {table_name}" for table_name in table_names)
+try:
+    # Count every table in a single round-trip
+    cursor.execute(count_query)
+    for table_name, count in cursor.fetchall():
         logging.info(f"Table {table_name}: {count} records")
-    except oracledb.DatabaseError as e:
-        logging.warning(f"Could not count records in table {table_name}: {str(e)}")
+except oracledb.DatabaseError:
+    # One missing table fails the whole query, so fall back to counting tables individually
+    for table_name in table_names:
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
+            count = cursor.fetchone()[0]
+            logging.info(f"Table {table_name}: {count} records")
+        except oracledb.DatabaseError as e:
+            logging.warning(f"Could not count records in table {table_name}: {str(e)}")
 
 # Close the connection
 try:
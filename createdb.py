@@ -59,33 +59,43 @@ except oracledb.DatabaseError as e:
     raise SystemExit(1)
 
 # Drop existing tables (in correct order to handle foreign key constraints)
-drop_table_queries = [
-    "DROP TABLE wheels_temperature CASCADE CONSTRAINTS",
-    "DROP TABLE wheels_load CASCADE CONSTRAINTS", 
-    "DROP TABLE work_orders CASCADE CONSTRAINTS",
-    "DROP TABLE assets_maintenance CASCADE CONSTRAINTS",
-    "DROP TABLE lifts CASCADE CONSTRAINTS",
-    "DROP TABLE trolleys CASCADE CONSTRAINTS",
-    "DROP TABLE inventory CASCADE CONSTRAINTS",
-    "DROP TABLE vessels CASCADE CONSTRAINTS",
-    "DROP TABLE cradles CASCADE CONSTRAINTS",
-    "DROP TABLE rails CASCADE CONSTRAINTS",
-    "DROP TABLE assets CASCADE CONSTRAINTS",
+drop_tables = [
+    "wheels_temperature",
+    "wheels_load",
+    "work_orders",
+    "assets_maintenance",
+    "lifts",
+    "trolleys",
+    "inventory",
+    "vessels",
+    "cradles",
+    "rails",
+    "assets",
 ]
 
+# Drop all tables in one anonymous PL/SQL block (one round-trip). Each table name is appended to the
+# :dropped or :skipped (ORA-00942, table does not exist) bind; any other error is collected in :errors.
+drop_tables_block = "BEGIN\n" + "".join(
+    f"  BEGIN EXECUTE IMMEDIATE 'DROP TABLE {table_name} CASCADE CONSTRAINTS'; :dropped := :dropped || '{table_name}' || CHR(10); "
+    f"EXCEPTION WHEN OTHERS THEN IF SQLCODE = -942 THEN :skipped := :skipped || '{table_name}' || CHR(10); "
+    f"ELSE :errors := :errors || '{table_name}: ' || SQLERRM || CHR(10); END IF; END;\n"
+    for table_name in drop_tables
+) + "END;"
+
 logging.info("Dropping existing tables...")
-for query in drop_table_queries:
-    try:
-        cursor.execute(query)
-        table_name = query.split()[2]
+try:
+    dropped = cursor.var(oracledb.DB_TYPE_VARCHAR, 32767)
+    skipped = cursor.var(oracledb.DB_TYPE_VARCHAR, 32767)
+    drop_errors = cursor.var(oracledb.DB_TYPE_VARCHAR, 32767)
+    cursor.execute(drop_tables_block, dropped=dropped, skipped=skipped, errors=drop_errors)
+    for table_name in (dropped.getvalue() or "").splitlines():
         logging.info(f"Table dropped successfully: {table_name}")
-    except oracledb.DatabaseError as e:
-        if "ORA-00942" in str(e):  # Table or view does not exist
-            table_name = query.split()[2]
-            logging.info(f"Table {table_name} doesn't exist, skipping...")
-        else:
-            table_name = query.split()[2]
-            logging.warning(f"Error dropping table {table_name}: {str(e)}")
+    for table_name in (skipped.getvalue() or "").splitlines():
+        logging.info(f"Table {table_name} doesn't exist, skipping...")
+    for error in (drop_errors.getvalue() or "").splitlines():
+        logging.warning(f"Error dropping table {error}")
+except oracledb.DatabaseError as e:
+    logging.warning(f"Error dropping tables: {str(e)}")
 
 # Create tables (in correct order for foreign key dependencies)
 create_table_queries = [
@@ -1,5 +1,9 @@
-from flask import Flask, request, jsonify
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from quart import Quart, request, jsonify
+from hypercorn.asyncio import serve
+from hypercorn.config import Config as HypercornConfig
+from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
+import asyncio
+import hashlib
 import json
 import torch
 import oracledb
@@ -8,14 +12,16 @@ import logging
 from dotenv import load_dotenv
 import re
 import inflect
-from typing import Set, Dict, Any
+from functools import lru_cache
+from collections import OrderedDict, deque
+from typing import Set, FrozenSet, Dict, Any, List, Optional, Tuple
 from rapidfuzz import fuzz, process
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Initialize Flask app
-app = Flask(__name__)
+# Initialize Quart app
+app = Quart(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -38,6 +44,45 @@ if missing_vars:
 # Create DSN
 dsn = f"{DB_HOST}:{DB_PORT}/{DB_SERVICE_NAME}"
 
+# Authentication mode for the connection pool
+if DB_PRIVILEGE == "SYSDBA":
+    auth_mode = oracledb.AUTH_MODE_SYSDBA
+elif DB_PRIVILEGE == "SYSOPER":
+    auth_mode = oracledb.AUTH_MODE_SYSOPER
+else:
+    auth_mode = oracledb.AUTH_MODE_DEFAULT
+
+# Async connection pool, created on the server's event loop at startup
+POOL = None
+
+# Rows fetched per round-trip when reading query results
+QUERY_ARRAYSIZE = 1000
+
+@app.before_serving
+async def create_pool():
+    global POOL
+    try:
+        logging.info(f"Creating connection pool for Oracle database at {dsn}")
+        POOL = oracledb.create_pool_async(
+            user=DB_USER,
+            password=DB_PASSWORD,
+            dsn=dsn,
+            mode=auth_mode,
+            min=2,
+            max=10,
+            increment=2,
+            ping_interval=60
+        )
+    except oracledb.DatabaseError as e:
+        logging.error(f"Connection pool creation failed: {e}")
+        raise
+
+@app.after_serving
+async def close_pool():
+    if POOL is not None:
+        await POOL.close()
+        logging.info("Connection pool closed.")
+
 # Initialize Inflect engine
 inflect_engine = inflect.engine()
 
@@ -47,6 +92,11 @@ STOP_WORDS = {
     "on", "by", "in", "and", "of", "the", "from", "assigned"
 }
 
+# Precompiled patterns for splitting prompts into words and extracting column names from SQL
+WORD_PATTERN = re.compile(r'\w+')
+# Simple regex to extract column names (not perfect, but sufficient for basic validation)
+COLUMN_PATTERN = re.compile(r'\b\w+\b(?=\s*[,)]|\s+FROM\s+|\s*$)', re.IGNORECASE)
+
 # Load schema from schema.json
 try:
     with open("schema.json", "r") as file:
@@ -65,6 +115,7 @@ except json.JSONDecodeError as e:
 # Initialize model
 MODEL_PATH = "qwen-oracle-sql-model"
 BASE_MODEL = "Qwen/Qwen1.5-0.5B"  # Assuming Qwen 0.6B is based on Qwen1.5-0.5B
+LOAD_IN_4BIT = os.getenv("LOAD_IN_4BIT", "true").lower() == "true"  # bitsandbytes quantization, CUDA only
 
 logging.info("Loading model...")
 try:
@@ -78,42 +129,150 @@ try:
     else:
         tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, use_fast=False)
 
+    # Batched generation needs left padding so every prompt ends right where generation starts
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    # Quantize weights to 4-bit NF4 on GPU; generation is memory-bound, so smaller weights decode faster
+    if LOAD_IN_4BIT and torch.cuda.is_available():
+        quantization_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.float16,
+            bnb_4bit_use_double_quant=True
+        )
+        logging.info("Loading model with 4-bit quantization.")
+    else:
+        quantization_config = None
+
     model = AutoModelForCausalLM.from_pretrained(
         MODEL_PATH,
         device_map="auto",
-        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32
+        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+        quantization_config=quantization_config
     )
+    model.eval()
+
+    if torch.cuda.is_available():
+        torch.backends.cuda.matmul.allow_tf32 = True
+        # Compile the forward pass used by generate; dynamic shapes avoid a recompile per prompt length
+        model.forward = torch.compile(model.forward, dynamic=True)
 
-    pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
     logging.info("Model loaded successfully.")
 except Exception as e:
     logging.error(f"Model loading failed: {e}")
     tokenizer = None
     model = None
-    pipe = None
 
-# Helper function to generate singular/plural variations
-def generate_variations(word: str) -> Set[str]:
-    return {word, inflect_engine.singular_noun(word) or word, inflect_engine.plural(word)}
-
-# Recursive function to find related tables
-def traverse_relationships(table: str, schema: Dict[str, Any], relevant_tables: Set[str]):
-    if table not in schema:
-        logging.warning(f"Table {table} not found in schema.")
-        return
-    foreign_keys = schema[table].get("foreign_keys", {})
-    for related_table in foreign_keys.values():
-        if related_table not in relevant_tables:
-            relevant_tables.add(related_table)
-            traverse_relationships(related_table, schema, relevant_tables)
+# Requests arriving within this window are generated together in one padded batch
+BATCH_WINDOW_SECONDS = 0.02
+MAX_BATCH_SIZE = 8
+
+# Queue of (input_ids, future) pairs waiting for generation, created at startup
+generation_queue: Optional[asyncio.Queue] = None
+generation_task: Optional[asyncio.Task] = None
+
+# Function to build the full prompt text the model was fine-tuned on
+def prompt_text(prompt: str, relevant_tables: Set[str]) -> str:
+    context = {table: schema[table] for table in sorted(relevant_tables)}
+    return f"Human: {prompt}\nContext: {json.dumps(context)}\nAssistant:"
+
+# Tokenize the schema context once per set of relevant tables; it dominates the prompt length.
+# The trailing newline belongs to this segment because Qwen's pre-tokenizer attaches it to the closing "}}".
+@lru_cache(maxsize=1024)
+def context_token_ids(tables: FrozenSet[str]) -> Tuple[int, ...]:
+    context = {table: schema[table] for table in sorted(tables)}
+    return tuple(tokenizer(f" {json.dumps(context)}\n", add_special_tokens=False)["input_ids"])
+
+# Function to build the prompt token ids from the freshly tokenized question and the cached context
+def prompt_token_ids(prompt: str, relevant_tables: Set[str]) -> List[int]:
+    if not SPLIT_TOKENIZATION:
+        return tokenizer(prompt_text(prompt, relevant_tables), add_special_tokens=False)["input_ids"]
+    prefix_ids = tokenizer(f"Human: {prompt}\nContext:", add_special_tokens=False)["input_ids"]
+    suffix_ids = tokenizer("Assistant:", add_special_tokens=False)["input_ids"]
+    return prefix_ids + list(context_token_ids(frozenset(relevant_tables))) + suffix_ids
+
+# Check once at startup that the split tokenization matches tokenizing the full prompt,
+# and fall back to full-prompt tokenization if it does not
+SPLIT_TOKENIZATION = True
+if tokenizer is not None:
+    sample_prompt = "List all vessels assigned to cradle C1?"
+    sample_tables = set(schema.keys())
+    expected_ids = tokenizer(prompt_text(sample_prompt, sample_tables), add_special_tokens=False)["input_ids"]
+    if prompt_token_ids(sample_prompt, sample_tables) != expected_ids:
+        logging.warning("Split prompt tokenization differs from full-prompt tokenization; caching of context tokens disabled.")
+        SPLIT_TOKENIZATION = False
+
+# Function to run one padded generate call over a batch of prompts
+def generate_batch(batch_input_ids: List[List[int]]) -> List[str]:
+    inputs = tokenizer.pad({"input_ids": batch_input_ids}, return_tensors="pt").to(model.device)
+    with torch.inference_mode():
+        output_ids = model.generate(
+            **inputs,
+            max_new_tokens=200,
+            pad_token_id=tokenizer.pad_token_id,
+            eos_token_id=tokenizer.eos_token_id,
+            do_sample=True,
+            temperature=0.2,
+            top_p=0.95,
+            use_cache=True
+        )
+    # Decode only the newly generated tokens of each sequence
+    return tokenizer.batch_decode(output_ids[:, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
+
+# Background task that coalesces queued prompts and generates them together
+async def generation_batcher():
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await generation_queue.get()]
+        deadline = loop.time() + BATCH_WINDOW_SECONDS
+        while len(batch) < MAX_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(generation_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        logging.info(f"Generating batch of {len(batch)} prompt(s)")
+        try:
+            outputs = await asyncio.to_thread(generate_batch, [input_ids for input_ids, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
 
-# Function to find relevant tables
-def find_relevant_tables(prompt: str, schema: Dict[str, Any]) -> Set[str]:
-    if not isinstance(schema, dict):
-        logging.error("Schema is not a dictionary. Expected a dictionary with table names as keys.")
-        raise ValueError("Schema must be a dictionary with table names as keys.")
+        for (_, future), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+# Function to queue a tokenized prompt for batched generation and wait for its completion
+async def generate_text(input_ids: List[int]) -> str:
+    future = asyncio.get_running_loop().create_future()
+    await generation_queue.put((input_ids, future))
+    return await future
 
-    prompt_words = [word for word in re.findall(r'\w+', prompt.lower()) if word not in STOP_WORDS]
+@app.before_serving
+async def start_generation_batcher():
+    global generation_queue, generation_task
+    generation_queue = asyncio.Queue()
+    generation_task = asyncio.create_task(generation_batcher())
+
+@app.after_serving
+async def stop_generation_batcher():
+    if generation_task is not None:
+        generation_task.cancel()
+
+# Helper function to generate singular/plural variations
+@lru_cache(maxsize=4096)
+def generate_variations(word: str) -> FrozenSet[str]:
+    return frozenset({word, inflect_engine.singular_noun(word) or word, inflect_engine.plural(word)})
+
+# Function to map table/column name variations to their table
+def build_schema_maps(schema: Dict[str, Any]) -> Tuple[Dict[str, str], Dict[str, str]]:
     table_map = {}
     column_map = {}
 
@@ -131,79 +290,122 @@ def find_relevant_tables(prompt: str, schema: Dict[str, Any]) -> Set[str]:
             for variation in generate_variations(column.lower()):
                 column_map[variation] = table
 
+    return table_map, column_map
+
+# The schema never changes after startup, so build the lookup maps and foreign-key adjacency once
+if isinstance(schema, dict):
+    TABLE_MAP, COLUMN_MAP = build_schema_maps(schema)
+    FK_ADJ = {
+        table: list(details.get("foreign_keys", {}).values())
+        for table, details in schema.items()
+        if isinstance(details, dict)
+    }
+else:
+    TABLE_MAP, COLUMN_MAP, FK_ADJ = {}, {}, {}
+TABLE_KEYS = tuple(TABLE_MAP.keys())
+COLUMN_KEYS = tuple(COLUMN_MAP.keys())
+
+# Iterative breadth-first walk over foreign keys to find related tables
+def traverse_relationships(table: str, relevant_tables: Set[str]):
+    queue = deque([table])
+    while queue:
+        current = queue.popleft()
+        if current not in FK_ADJ:
+            logging.warning(f"Table {current} not found in schema.")
+            continue
+        for related_table in FK_ADJ[current]:
+            if related_table not in relevant_tables:
+                relevant_tables.add(related_table)
+                queue.append(related_table)
+
+# Function to find the best-scoring choice for each word in a single vectorized call
+def best_matches(words: List[str], choices: Tuple[str, ...]) -> List[Tuple[str, float]]:
+    if not words or not choices:
+        return []
+    scores = process.cdist(words, choices, scorer=fuzz.token_set_ratio, workers=-1)
+    best = scores.argmax(axis=1)
+    best_scores = scores.max(axis=1)
+    mask = best_scores > 60
+    return [(choices[index], float(score)) for index, score in zip(best[mask], best_scores[mask])]
+
+# Function to find relevant tables
+def find_relevant_tables(prompt: str, schema: Dict[str, Any]) -> Set[str]:
+    if not isinstance(schema, dict):
+        logging.error("Schema is not a dictionary. Expected a dictionary with table names as keys.")
+        raise ValueError("Schema must be a dictionary with table names as keys.")
+
+    prompt_words = [word for word in WORD_PATTERN.findall(prompt.lower()) if word not in STOP_WORDS]
+
     matched_tables = set()
-    for word in prompt_words:
-        table_match = process.extractOne(word, table_map.keys(), scorer=fuzz.token_set_ratio)
-        if table_match and table_match[1] > 60:
-            matched_tables.add(table_map[table_match[0]])
-            logging.info(f"Matched table: {table_map[table_match[0]]} (score: {table_match[1]})")
+    for table_key, score in best_matches(prompt_words, TABLE_KEYS):
+        matched_tables.add(TABLE_MAP[table_key])
+        logging.info(f"Matched table: {TABLE_MAP[table_key]} (score: {score})")
 
-        column_match = process.extractOne(word, column_map.keys(), scorer=fuzz.token_set_ratio)
-        if column_match and column_match[1] > 60:
-            matched_tables.add(column_map[column_match[0]])
-            logging.info(f"Matched column: {column_match[0]} -> table: {column_map[column_match[0]]} (score: {column_match[1]})")
+    for column_key, score in best_matches(prompt_words, COLUMN_KEYS):
+        matched_tables.add(COLUMN_MAP[column_key])
+        logging.info(f"Matched column: {column_key} -> table: {COLUMN_MAP[column_key]} (score: {score})")
 
     relevant_tables = set(matched_tables)
     for table in matched_tables:
-        traverse_relationships(table, schema, relevant_tables)
+        traverse_relationships(table, relevant_tables)
 
     logging.info(f"Relevant tables: {relevant_tables}")
     return relevant_tables
 
 # Function to validate columns in the query against the schema
 def validate_query_columns(query: str, schema: Dict[str, Any], relevant_tables: Set[str]):
-    # Simple regex to extract column names (not perfect, but sufficient for basic validation)
-    column_pattern = r'\b\w+\b(?=\s*[,)]|\s+FROM\s+|\s*$)'
-    columns = re.findall(column_pattern, query, re.IGNORECASE)
+    columns = COLUMN_PATTERN.findall(query)
+    valid_columns = {c.lower() for table in relevant_tables for c in schema[table].get("columns", [])}
     invalid_columns = []
+    seen_invalid = set()
 
-    for table in relevant_tables:
-        valid_columns = schema[table].get("columns", [])
-        for column in columns:
-            if column.lower() not in [c.lower() for c in valid_columns] and column.lower() not in invalid_columns:
-                invalid_columns.append(column)
+    for column in columns:
+        column_lower = column.lower()
+        if column_lower not in valid_columns and column_lower not in seen_invalid:
+            seen_invalid.add(column_lower)
+            invalid_columns.append(column)
 
     if invalid_columns:
         logging.warning(f"Invalid columns in query: {invalid_columns}")
     return invalid_columns
 
 # Function to execute SQL query
-def execute_query(query: str) -> list:
+async def execute_query(query: str) -> list:
     # Remove trailing semicolon
     query = query.rstrip(";").strip()
     try:
-        logging.info(f"Connecting to Oracle database at {dsn}")
-        if DB_PRIVILEGE == "SYSDBA":
-            connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn, mode=oracledb.AUTH_MODE_SYSDBA)
-        elif DB_PRIVILEGE == "SYSOPER":
-            connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn, mode=oracledb.AUTH_MODE_SYSOPER)
-        else:
-            connection = oracledb.connect(user=DB_USER, password=DB_PASSWORD, dsn=dsn)
-        
-        cursor = connection.cursor()
-        logging.info(f"Executing query: {query}")
-        
-        cursor.execute(query)
-        columns = [col[0] for col in cursor.description] if cursor.description else []
-        results = cursor.fetchall()
-        
+        async with POOL.acquire() as connection:
+            with connection.cursor() as cursor:
+                # Fetch rows in large batches so big result sets need fewer round-trips
+                cursor.arraysize = QUERY_ARRAYSIZE
+                cursor.prefetchrows = QUERY_ARRAYSIZE + 1
+                logging.info(f"Executing query: {query}")
+
+                await cursor.execute(query)
+                columns = [col[0] for col in cursor.description] if cursor.description else []
+                results = await cursor.fetchall()
+
         result_list = [dict(zip(columns, row)) for row in results]
-        
-        cursor.close()
-        connection.close()
         logging.info("Query executed successfully.")
         return result_list
     except oracledb.DatabaseError as e:
         logging.error(f"Database query failed: {e}")
         raise
 
+# LRU cache of generated queries keyed by prompt and relevant tables, so repeat prompts skip the model.
+GENERATION_CACHE_SIZE = 1024
+generation_cache: "OrderedDict[str, str]" = OrderedDict()
+
+def generation_cache_key(prompt: str, relevant_tables: Set[str]) -> str:
+    return hashlib.sha256(f"{prompt}|{','.join(sorted(relevant_tables))}".encode("utf-8")).hexdigest()
+
 # API Endpoint to generate and execute SQL query
 @app.route("/generate-and-execute-sql", methods=["POST"])
-def generate_and_execute_sql():
-    if pipe is None:
+async def generate_and_execute_sql():
+    if model is None:
         return jsonify({"error": "Model not loaded", "generated_query": None}), 500
 
-    data = request.get_json()
+    data = await request.get_json()
     prompt = data.get("prompt")
 
     if not prompt:
@@ -216,24 +418,20 @@ def generate_and_execute_sql():
         if not relevant_tables:
             return jsonify({"error": "No relevant tables found for the prompt", "generated_query": None}), 400
 
-        # Prepare context with schema information for relevant tables
-        context = {table: schema[table] for table in relevant_tables}
-        context_str = json.dumps(context)
-
-        # Generate SQL query
-        input_text = f"Human: {prompt}\nContext: {context_str}\nAssistant:"
-        response = pipe(
-            input_text,
-            max_new_tokens=200,
-            pad_token_id=tokenizer.eos_token_id,
-            eos_token_id=tokenizer.eos_token_id,
-            do_sample=True,
-            temperature=0.2,
-            top_p=0.95
-        )
+        # Generate SQL query unless this prompt was answered before; concurrent requests are batched
+        cache_key = generation_cache_key(prompt, relevant_tables)
+        generated_query = generation_cache.get(cache_key)
+        from_cache = generated_query is not None
+        if from_cache:
+            generation_cache.move_to_end(cache_key)
+            logging.info(f"Generated query (cached): {generated_query}")
+        else:
+            # Prompt is "Human: {prompt}\nContext: {schema of relevant tables}\nAssistant:"
+            input_ids = await asyncio.to_thread(prompt_token_ids, prompt, relevant_tables)
+            generated_text = await generate_text(input_ids)
 
-        generated_query = response[0]['generated_text'].split("Assistant:")[-1].strip()
-        logging.info(f"Generated query: {generated_query}")
+            generated_query = generated_text.split("Assistant:")[-1].strip()
+            logging.info(f"Generated query: {generated_query}")
 
         # Validate columns in the query
         invalid_columns = validate_query_columns(generated_query, schema, relevant_tables)
@@ -241,7 +439,13 @@ def generate_and_execute_sql():
             logging.warning(f"Generated query contains invalid columns: {invalid_columns}")
 
         # Execute the generated query
-        results = execute_query(generated_query)
+        results = await execute_query(generated_query)
+
+        # Cache only queries that ran successfully, so a failing sample can be regenerated
+        if not from_cache:
+            generation_cache[cache_key] = generated_query
+            if len(generation_cache) > GENERATION_CACHE_SIZE:
+                generation_cache.popitem(last=False)
 
         return jsonify({
             "input_prompt": prompt,
@@ -260,4 +464,7 @@ def generate_and_execute_sql():
         }), 500
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # Serve with Hypercorn (production ASGI server) rather than the debug development server
+    config = HypercornConfig()
+    config.bind = ["0.0.0.0:5000"]
+    asyncio.run(serve(app, config))